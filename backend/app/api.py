@@ -1,17 +1,100 @@
 # backend/app/api.py
-from fastapi import APIRouter
-from pydantic import BaseModel
+import heapq
+import threading
+from bisect import bisect_right
+import orjson
+from fastapi import APIRouter, Response
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, Field
 from typing import List, Optional
 from collections import Counter
+from functools import lru_cache, partial
+from operator import itemgetter
 from app.utils import load_flattened_messages
-from app.semantic_search import semantic_engine  # ✅ import your semantic engine
+from app.batcher import query_batcher
 
 router = APIRouter()
 
+# ---------- Message cache ----------
+# Parsed flattenedMessages.json plus derived lookup views, rebuilt only when
+# load_flattened_messages returns a new list (i.e. the file changed)
+_MESSAGES_CACHE = {"data": None}
+# serializes rebuilds so concurrent requests after a change build the views once
+_MESSAGES_CACHE_LOCK = threading.Lock()
+
+# Separator between texts in the joined corpus; never expected inside a message
+_CORPUS_SEP = "\x00"
+
+def _get_cache():
+    """Return the message cache, rebuilding it if the data file changed"""
+    global _MESSAGES_CACHE
+    messages = load_flattened_messages()
+    if _MESSAGES_CACHE["data"] is messages:
+        return _MESSAGES_CACHE
+    with _MESSAGES_CACHE_LOCK:
+        # re-fetch (a stat on a hit) so a request holding an older list never swaps stale
+        # views back in, then re-check: another request may have rebuilt while this one waited
+        messages = load_flattened_messages()
+        if _MESSAGES_CACHE["data"] is not messages:
+            # lowercased texts kept parallel to `data` so searches skip str.lower()
+            text_lower = [m.get("text", "").lower() for m in messages]
+            # one joined corpus so a query is matched by a single C-level scan;
+            # offsets[i] is where message i starts in it
+            offsets, pos = [], 0
+            for t in text_lower:
+                offsets.append(pos)
+                pos += len(t) + 1
+            # conversationId -> indices of its messages, in corpus order
+            convo_index = {}
+            for i, m in enumerate(messages):
+                convo_index.setdefault(m.get("conversationId"), []).append(i)
+            # swap in a fresh dict so concurrent readers never see a partial rebuild
+            cache = {
+                "data": messages,
+                "text_lower": text_lower,
+                "corpus": _CORPUS_SEP.join(text_lower),
+                "offsets": offsets,
+                "convo_index": convo_index,
+                # /messages body, encoded once per reload instead of per request
+                "messages_response_bytes": orjson.dumps({"messages": messages}),
+            }
+            # summaries memoized per snapshot, so an entry always matches the data it was
+            # computed from and the whole memo is dropped with the snapshot on reload
+            cache["summarize"] = lru_cache(maxsize=1024)(partial(_summarize_core, cache))
+            _MESSAGES_CACHE = cache
+    return _MESSAGES_CACHE
+
+def _find_matches(cache, query, limit):
+    """Return indices of the first `limit` messages whose lowercased text contains `query`"""
+    if _CORPUS_SEP in query:
+        return [i for i, t in enumerate(cache["text_lower"]) if query in t][:limit]
+
+    corpus, offsets = cache["corpus"], cache["offsets"]
+    if not offsets:
+        return []
+    matches = []
+    pos = corpus.find(query)
+    while pos != -1 and len(matches) < limit:
+        i = bisect_right(offsets, pos) - 1
+        matches.append(i)
+        # resume at the next message so each one is reported once
+        if i + 1 == len(offsets):
+            break
+        pos = corpus.find(query, offsets[i + 1])
+    return matches
+
 # ---------- Models ----------
+# Upper bound on semantic search top_k; concurrent queries share one FAISS call,
+# so one oversized k would be paid (or fail) for the whole batch
+MAX_TOP_K = 100
+
 class SearchRequest(BaseModel):
     query: str
-    top_k: int = 5   # default if not provided
+    top_k: int = Field(5, gt=0, le=MAX_TOP_K)   # default if not provided
+
+class KeywordSearchRequest(BaseModel):
+    query: str
+    top_k: Optional[int] = None  # optional cap on matches; every match if not provided
 
 class SummarizeRequest(BaseModel):
     conversationId: str
@@ -21,60 +104,84 @@ class SummarizeRequest(BaseModel):
 @router.get("/messages")
 def get_all_messages():
     """Return all messages from flattenedMessages.json"""
-    messages = load_flattened_messages()
-    return {"messages": messages}
+    return Response(_get_cache()["messages_response_bytes"], media_type="application/json")
 
 @router.post("/search")
-def search_messages(payload: SearchRequest):
-    """Simple keyword search"""
+def search_messages(payload: KeywordSearchRequest):
+    """Simple keyword search, returning every match (or the first top_k if given)"""
     query = payload.query.lower()
-    messages = load_flattened_messages()
-    filtered = [msg for msg in messages if query in msg["text"].lower()]
-    return {"results": filtered}
+    cache = _get_cache()
+    messages = cache["data"]
+    limit = len(messages) if payload.top_k is None else payload.top_k
+    filtered = [messages[i] for i in _find_matches(cache, query, limit)]
+    return ORJSONResponse({"results": filtered})
 
 @router.post("/semantic-search")
-def semantic_search(payload: SearchRequest):
-    """Semantic search using embeddings + FAISS"""
-    results = semantic_engine.search(payload.query, payload.top_k)
-    return {"query": payload.query, "results": results}
+async def semantic_search(payload: SearchRequest):
+    """Semantic search using embeddings + FAISS, batched with concurrent requests"""
+    results = await query_batcher.submit(payload.query, payload.top_k)
+    return ORJSONResponse({"query": payload.query, "results": results})
 
-@router.post("/summarize")
-def summarize_conversation(payload: SummarizeRequest):
-    """Offline extractive summarization using simple word frequency"""
-    messages = load_flattened_messages()
-    convo_msgs = [m for m in messages if m.get("conversationId") == payload.conversationId]
+def _summarize_core(cache, conversation_id, scope):
+    """
+    Summarize one conversation from a cache snapshot, returning (summary, highlights)
+    as immutable values. Called through the snapshot's memoized cache["summarize"].
+    """
+    idxs = cache["convo_index"].get(conversation_id, [])
 
-    if not convo_msgs:
-        return {"conversationId": payload.conversationId, "summary": "No messages found."}
+    if not idxs:
+        return "No messages found.", None
 
     # restrict scope if requested
-    if payload.scope.startswith("last_"):
+    if scope.startswith("last_"):
         try:
-            n = int(payload.scope.split("_")[1])
-            convo_msgs = convo_msgs[-n:]
+            n = int(scope.split("_")[1])
+            idxs = idxs[-n:]
         except:
             pass
 
-    texts = [m["text"] for m in convo_msgs if "text" in m]
+    # work on indices into the cache; skip messages without a text field (empty
+    # texts still count, as before, so the response keeps its highlights list)
+    messages = cache["data"]
+    idxs = [i for i in idxs if "text" in messages[i]]
+
+    if not idxs:
+        return "No text content found.", None
 
-    if not texts:
-        return {"conversationId": payload.conversationId, "summary": "No text content found."}
+    # single pass: tokenize the cached lowercase texts and build word frequency
+    text_lower = cache["text_lower"]
+    tokenized = []
+    freq = Counter()
+    for i in idxs:
+        toks = text_lower[i].split()
+        tokenized.append(toks)
+        freq.update(toks)
 
-    # word frequency
-    words = " ".join(texts).lower().split()
-    freq = Counter(words)
+    # keep the top 3 sentences in a size-3 min-heap while scoring; entries are
+    # (score, -k) so ties evict the later message, matching a stable sort
+    top_heap = []
+    for k, toks in enumerate(tokenized):
+        entry = (sum(freq[w] for w in toks), -k)
+        if len(top_heap) < 3:
+            heapq.heappush(top_heap, entry)
+        elif entry > top_heap[0]:
+            heapq.heapreplace(top_heap, entry)
 
-    scored = []
-    for t in texts:
-        score = sum(freq[w] for w in t.lower().split())
-        scored.append((score, t))
+    top_sentences = [messages[idxs[-neg_k]]["text"] for _, neg_k in sorted(top_heap, reverse=True)]
 
-    # pick top 3
-    top_sentences = [s for _, s in sorted(scored, key=lambda x: x[0], reverse=True)[:3]]
-    highlights = [w for w, c in freq.most_common(5) if len(w) > 3]
+    # filter short words before the top-5 selection so up to 5 highlights come back
+    highlights = tuple(w for w, _ in heapq.nlargest(
+        5, ((w, c) for w, c in freq.items() if len(w) > 3), key=itemgetter(1)))
+
+    return " ".join(top_sentences), highlights
+
+@router.post("/summarize")
+def summarize_conversation(payload: SummarizeRequest):
+    """Offline extractive summarization using simple word frequency"""
+    summarize = _get_cache()["summarize"]
+    summary, highlights = summarize(payload.conversationId, payload.scope or "all")
 
-    return {
-        "conversationId": payload.conversationId,
-        "summary": " ".join(top_sentences),
-        "highlights": highlights,
-    }
+    result = {"conversationId": payload.conversationId, "summary": summary}
+    if highlights is not None:
+        result["highlights"] = list(highlights)
+    return result
@@ -0,0 +1,121 @@
+# backend/app/batcher.py
+"""
+Coalesces concurrent semantic search requests into batched engine calls.
+
+Each /semantic-search request submits its query to a shared queue. A background
+task collects up to MAX_BATCH queries, runs them through
+SemanticSearchEngine.search_batch in one encode + one FAISS search on a worker
+thread, and hands each caller its own results. A batch is flushed as soon as it is
+full, or MAX_WAIT seconds after its first query arrived, so a lone query waits
+at most MAX_WAIT.
+"""
+
+import asyncio
+from fastapi.concurrency import run_in_threadpool
+from app.semantic_search import semantic_engine
+
+MAX_BATCH = 32
+MAX_WAIT = 0.005  # seconds to wait for more queries before flushing a batch
+
+
+class QueryBatcher:
+    """
+    Micro-batcher that turns concurrent search(query, top_k) calls into search_batch calls.
+    """
+    def __init__(self, engine, max_batch: int = MAX_BATCH, max_wait: float = MAX_WAIT):
+        self.engine = engine
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = None
+        self._task = None
+
+    def start(self):
+        """
+        Start the background batching task. Must be called from the running event loop.
+        """
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Cancel the background task and fail every query still waiting for results.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            pending = []
+            while not self._queue.empty():
+                pending.append(self._queue.get_nowait())
+            _fail(pending, RuntimeError("Query batcher stopped"))
+            self._task = None
+            self._queue = None
+
+    async def submit(self, query: str, top_k: int = 5):
+        """
+        Queue a query and wait for its results.
+
+        Falls back to a direct single-query search if the batcher was never started.
+        """
+        if self._task is None:
+            return await run_in_threadpool(self.engine.search, query, top_k)
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((query, top_k, future))
+        return await future
+
+    async def _collect(self, batch):
+        """
+        Fill `batch` in place until it holds max_batch queries or max_wait has passed
+        since its first query arrived.
+        """
+        loop = asyncio.get_running_loop()
+        batch.append(await self._queue.get())
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+    async def _run(self):
+        batch = []
+        try:
+            while True:
+                batch = []
+                await self._collect(batch)
+
+                queries = [query for query, _, _ in batch]
+                top_k = max(k for _, k, _ in batch)
+                try:
+                    results = await run_in_threadpool(self.engine.search_batch, queries, top_k)
+                except Exception as e:
+                    _fail(batch, e)
+                    continue
+
+                # every request in the batch was searched with the largest top_k; trim to its own
+                for (_, k, future), hits in zip(batch, results):
+                    if not future.done():
+                        future.set_result(hits[:k])
+        finally:
+            # on shutdown, fail the batch being collected or searched so callers don't hang
+            _fail(batch, RuntimeError("Query batcher stopped"))
+
+
+def _fail(batch, exc):
+    for _, _, future in batch:
+        if not future.done():
+            future.set_exception(exc)
+
+
+# Singleton batcher shared by the API routes
+query_batcher = QueryBatcher(semantic_engine)
@@ -1,10 +1,32 @@
 # backend/app/main.py
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api import router as api_router
-from app.semantic_search import semantic_engine   # ✅ import your engine
+from app.semantic_search import get_model, semantic_engine   # ✅ import your engine
+from app.batcher import query_batcher
 
-app = FastAPI(title="Message App API", version="1.0.0")
+# Load FAISS index on startup
+def load_faiss_index():
+    try:
+        semantic_engine.load_index()
+        print("✅ FAISS index loaded successfully")
+    except Exception as e:
+        print(f"⚠️ Could not load FAISS index: {e}")
+        print("👉 Run `python -m app.build_index` first to generate the index.")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load and warm the embedding model before serving, so the first search runs at steady-state speed
+    get_model()
+    print("✅ Embedding model loaded")
+    load_faiss_index()
+    # Start coalescing semantic search requests once the event loop is running
+    query_batcher.start()
+    yield
+    await query_batcher.stop()
+
+app = FastAPI(title="Message App API", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -15,19 +37,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Load FAISS index on startup
-@app.on_event("startup")
-def load_faiss_index():
-    try:
-        semantic_engine.load_index()
-        print("✅ FAISS index loaded successfully")
-    except Exception as e:
-        print(f"⚠️ Could not load FAISS index: {e}")
-        print("👉 Run `python -m app.build_index` first to generate the index.")
-
 # Register API routes
 app.include_router(api_router, prefix="/api")
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
+    uvicorn.run("app.main:app", host="0.0.0.0", port=8000)
@@ -6,29 +6,251 @@ Provides a semantic search engine for message data using FAISS and sentence-tran
 This module enables building, saving, loading, and querying a vector index of messages for fast semantic search.
 
 Key components:
-- SemanticSearchEngine: Class for managing the FAISS index and metadata.
+- SemanticSearchEngine: Class for managing the FAISS index and column-wise message metadata.
 - build_and_save_index: Helper function to build and persist the index from message data.
 
 Dependencies:
 - faiss: For efficient similarity search on vector embeddings.
 - sentence-transformers: For generating message embeddings.
-- numpy, json, os: Standard utilities.
+- numpy, orjson, os: Standard utilities.
 """
 
+import functools
 import os
-import json
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
 import faiss
 import numpy as np
+import orjson
 from sentence_transformers import SentenceTransformer
 from app.utils import load_flattened_messages
 
 # Paths for saving index and metadata
-DATA_DIR = os.path.join(os.path.dirname(__file__), "../../shared/data")
-INDEX_PATH = os.path.join(DATA_DIR, "faiss.index")
-META_PATH = os.path.join(DATA_DIR, "faiss_meta.json")
+DATA_DIR = (Path(__file__).parent / ".." / ".." / "shared" / "data").resolve()
+INDEX_PATH = DATA_DIR / "faiss.index"
+META_PATH = DATA_DIR / "faiss_meta.json"
 
-# Load the sentence transformer model once (small & fast)
-model = SentenceTransformer("all-MiniLM-L6-v2")
+# Embedding model, e.g. "sentence-transformers/paraphrase-MiniLM-L3-v2" for ~2x faster encodes
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+# Optional output dimension; embeddings are truncated to it (then L2-normalized), shrinking the
+# index and distance compute. Best with Matryoshka-trained models. Unset keeps the full dimension.
+EMBEDDING_DIM = int(os.environ["EMBEDDING_DIM"]) if os.environ.get("EMBEDDING_DIM") else None
+# Inference backend: "torch" (default) or "onnx". The ONNX backend runs an INT8-quantized
+# export of the model through onnxruntime; install it with `pip install sentence-transformers[onnx]`.
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "torch")
+# Quantized export inside the model repo; pick the file matching the CPU (avx2, avx512, avx512_vnni, arm64)
+ONNX_MODEL_FILE = os.environ.get("EMBEDDING_ONNX_FILE", "onnx/model_quint8_avx2.onnx")
+
+def _load_model():
+    """
+    Load the sentence transformer with the configured inference backend.
+    """
+    if EMBEDDING_BACKEND == "onnx":
+        return SentenceTransformer(
+            EMBEDDING_MODEL, backend="onnx", truncate_dim=EMBEDDING_DIM,
+            model_kwargs={"file_name": ONNX_MODEL_FILE}
+        )
+    return SentenceTransformer(EMBEDDING_MODEL, truncate_dim=EMBEDDING_DIM)
+
+@functools.cache
+def get_model():
+    """
+    Load and warm up the sentence transformer on first use; return the shared instance.
+
+    Called by the FastAPI lifespan at startup, so importing this module stays cheap
+    (reloads, CLI) and the first request already sees a warm model.
+    """
+    model = _load_model()
+    # one dummy encode initializes the tokenizer and inference kernels
+    model.encode(["warmup"])
+    return model
+
+# LRU of query embeddings keyed on normalized query text, so repeated queries
+# (autocomplete, UI retries) skip the transformer forward pass
+QUERY_CACHE_SIZE = 4096
+_query_cache = OrderedDict()
+_query_cache_lock = threading.Lock()
+
+@functools.cache
+def _model_lowercases() -> bool:
+    """
+    Whether the embedding model lowercases its input (uncased tokenizer, e.g. MiniLM).
+    """
+    model = get_model()
+    return bool(
+        getattr(model.tokenizer, "do_lower_case", False) or getattr(model[0], "do_lower_case", False)
+    )
+
+def _normalize_query(query: str) -> str:
+    """
+    Normalize a query for embedding and cache lookup: collapse whitespace, and lowercase
+    only when the model does so itself, so the embedding of cased models is unchanged.
+    """
+    query = " ".join(query.split())
+    return query.lower() if _model_lowercases() else query
+
+def _encode_queries(queries):
+    """
+    Encode queries into an L2-normalized (B, d) float32 matrix, reusing cached embeddings.
+
+    Cache misses are encoded together in a single model.encode call.
+    """
+    keys = [_normalize_query(q) for q in queries]
+    vectors = {}
+    with _query_cache_lock:
+        for key in keys:
+            if key in _query_cache:
+                _query_cache.move_to_end(key)
+                vectors[key] = _query_cache[key]
+
+    misses = list(dict.fromkeys(k for k in keys if k not in vectors))
+    if misses:
+        encoded = get_model().encode(
+            misses, convert_to_numpy=True, batch_size=len(misses), normalize_embeddings=True
+        )
+        with _query_cache_lock:
+            for key, vec in zip(misses, encoded):
+                vec = vec.copy()  # don't pin the whole batch matrix in the cache
+                vectors[key] = vec
+                _query_cache[key] = vec
+                _query_cache.move_to_end(key)
+            while len(_query_cache) > QUERY_CACHE_SIZE:
+                _query_cache.popitem(last=False)
+
+    return np.vstack([vectors[k] for k in keys])
+
+# Corpora larger than this are encoded by one worker process per CPU core
+MULTI_PROCESS_MIN_TEXTS = 10_000
+# MiniLM's sweet spot on CPU; larger batches mostly add padding
+ENCODE_BATCH_SIZE = 64
+# Messages encoded and added to the index per step, bounding peak embedding memory
+BUILD_CHUNK_SIZE = 8192
+# Print build progress roughly once per this many indexed messages
+PROGRESS_EVERY = 10_000
+
+@contextmanager
+def _corpus_encoder_pool(num_texts: int):
+    """
+    Yield a multi-process encode pool for large corpora, or None to encode in-process.
+    """
+    num_workers = os.cpu_count() or 1
+    if num_texts <= MULTI_PROCESS_MIN_TEXTS or num_workers < 2:
+        yield None
+        return
+
+    encoder = get_model()
+    pool = encoder.start_multi_process_pool(target_devices=["cpu"] * num_workers)
+    try:
+        yield pool
+    finally:
+        encoder.stop_multi_process_pool(pool)
+
+def _encode_corpus(texts, pool=None):
+    """
+    Encode corpus texts into L2-normalized embeddings, sharded across `pool` workers if given.
+    """
+    # encode shards across the pool's workers itself when given one (pool=None runs in-process)
+    return get_model().encode(
+        texts, pool=pool, convert_to_numpy=True, show_progress_bar=False,
+        batch_size=ENCODE_BATCH_SIZE, normalize_embeddings=True
+    )
+
+# Search result key -> message metadata field, stored column-wise for row lookups
+RESULT_FIELDS = {
+    "conversationId": "conversationId",
+    "messageId": "id",
+    "snippet": "text",
+    "participant": "participant",
+    "timestamp": "timestamp",
+}
+
+# Index layout: flat 8-bit scalar-quantized search for small corpora, IVF-PQ above this size
+IVF_MIN_VECTORS = 10_000
+# Number of IVF cells probed per query
+NPROBE = 16
+
+def _gpu_resources():
+    """
+    Return FAISS GPU resources when a faiss-gpu build sees a device, else None (CPU-only).
+    """
+    if not hasattr(faiss, "StandardGpuResources") or faiss.get_num_gpus() == 0:
+        return None
+    return faiss.StandardGpuResources()
+
+# Shared GPU resources; None keeps every index on the CPU
+gpu_resources = _gpu_resources()
+
+def _to_gpu(index):
+    """
+    Copy an index to GPU 0, or return None if there is no GPU or the index type is unsupported.
+    """
+    if gpu_resources is None:
+        return None
+    try:
+        return faiss.index_cpu_to_gpu(gpu_resources, 0, index)
+    except RuntimeError as e:
+        print(f"⚠️ Keeping FAISS index on CPU: {e}")
+        return None
+
+def _pq_subquantizers(dim: int) -> int:
+    """
+    Pick the number of PQ sub-quantizers: the largest preferred value dividing dim.
+    """
+    return next(m for m in (48, 32, 24, 16, 8, 4, 2, 1) if dim % m == 0)
+
+def _ivf_nlist(n: int) -> int:
+    """
+    Number of IVF cells for a corpus of n vectors.
+
+    ~4·sqrt(n), capped so even just above IVF_MIN_VECTORS every centroid gets the 39
+    training points FAISS k-means needs (training then uses the whole corpus).
+    """
+    return min(int(4 * np.sqrt(n)), n // 39)
+
+def _train_sample_size(n: int) -> int:
+    """
+    Number of vectors to train the index on for a corpus of n vectors.
+    """
+    if n < IVF_MIN_VECTORS:
+        return n
+    # ~64 points per IVF centroid, and enough for 256-centroid PQ codebooks
+    return min(n, max(64 * _ivf_nlist(n), 10_000))
+
+def _create_index(train_embeddings, n: int):
+    """
+    Create and train an inner-product FAISS index sized for a corpus of n vectors.
+
+    Embeddings must already be L2-normalized, so inner product equals cosine similarity.
+    """
+    dim = train_embeddings.shape[1]
+    if n < IVF_MIN_VECTORS:
+        # too few vectors to train IVF/PQ without noise; a flat scan over 8-bit codes
+        # keeps search exhaustive at a quarter of the FP32 size
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+    else:
+        m = _pq_subquantizers(dim)
+        index = faiss.index_factory(dim, f"IVF{_ivf_nlist(n)},PQ{m}", faiss.METRIC_INNER_PRODUCT)
+
+    # IVF k-means / PQ training is the slow part of a large build; run it on the GPU
+    # when available and copy the trained index back so it can be saved
+    gpu_index = _to_gpu(index)
+    if gpu_index is not None:
+        gpu_index.train(train_embeddings)
+        return faiss.index_gpu_to_cpu(gpu_index)
+
+    index.train(train_embeddings)
+    return index
+
+def _prepare_for_search(index):
+    """
+    Apply search-time settings to a built or loaded index and move it to the GPU if possible.
+    """
+    if isinstance(index, faiss.IndexIVF):
+        index.nprobe = NPROBE
+    gpu_index = _to_gpu(index)
+    return gpu_index if gpu_index is not None else index
 
 class SemanticSearchEngine:
     """
@@ -40,7 +262,8 @@ class SemanticSearchEngine:
         Initialize the search engine with empty index and metadata.
         """
         self.index = None  # FAISS index object
-        self.metadata = []  # List of message dicts
+        self.columns = {}  # Result key -> object ndarray, one entry per indexed message
+        self.num_messages = 0
 
     def build_index(self, messages):
         """
@@ -54,21 +277,33 @@ class SemanticSearchEngine:
             - Saves the message metadata to META_PATH
         """
         texts = [m["text"] for m in messages]
-        # Generate embeddings for all messages
-        embeddings = model.encode(texts, convert_to_numpy=True, show_progress_bar=True)
-
-        dim = embeddings.shape[1]
-        # Use L2 index (cosine similarity can be approximated with L2 norm after normalization)
-        index = faiss.IndexFlatL2(dim)
-        index.add(embeddings)
+        n = len(texts)
+        # Embeddings are L2-normalized inside encode so inner product is cosine similarity
+        with _corpus_encoder_pool(n) as pool:
+            train_size = _train_sample_size(n)
+            if train_size == n:
+                # training needs every vector anyway, so one encode serves both steps
+                embeddings = _encode_corpus(texts, pool)
+                index = _create_index(embeddings, n)
+                index.add(embeddings)
+            else:
+                # train on a random sample, then stream the corpus in chunks so only
+                # one chunk of embeddings is held in memory at a time
+                sample = np.sort(np.random.default_rng(0).choice(n, size=train_size, replace=False))
+                index = _create_index(_encode_corpus([texts[i] for i in sample], pool), n)
+                for start in range(0, n, BUILD_CHUNK_SIZE):
+                    index.add(_encode_corpus(texts[start:start + BUILD_CHUNK_SIZE], pool))
+                    done = min(start + BUILD_CHUNK_SIZE, n)
+                    if done // PROGRESS_EVERY > start // PROGRESS_EVERY or done == n:
+                        print(f"🔄 Indexed {done}/{n} messages")
 
         # Save index and metadata to disk
-        faiss.write_index(index, INDEX_PATH)
-        with open(META_PATH, "w", encoding="utf-8") as f:
-            json.dump(messages, f, ensure_ascii=False, indent=2)
+        faiss.write_index(index, str(INDEX_PATH))
+        with open(META_PATH, "wb") as f:
+            f.write(orjson.dumps(messages))
 
-        self.index = index
-        self.metadata = messages
+        self.index = _prepare_for_search(index)
+        self._set_metadata(messages)
 
     def load_index(self):
         """
@@ -76,13 +311,48 @@ class SemanticSearchEngine:
 
         Raises:
             FileNotFoundError: If index or metadata files are missing.
+            ValueError: If the index dimension does not match the configured embedding model,
+                or the index was not built for inner-product (cosine) search.
         """
-        if not os.path.exists(INDEX_PATH) or not os.path.exists(META_PATH):
+        if not INDEX_PATH.exists() or not META_PATH.exists():
             raise FileNotFoundError("FAISS index or metadata not found. Run build_index first.")
 
-        self.index = faiss.read_index(INDEX_PATH)
-        with open(META_PATH, "r", encoding="utf-8") as f:
-            self.metadata = json.load(f)
+        with open(META_PATH, "rb") as f:
+            messages = orjson.loads(f.read())
+
+        # Memory-map the index so pages are faulted in on demand instead of read at startup.
+        # The flag depends on the layout build_index picked for this corpus size (the two
+        # cannot be combined): IO_FLAG_MMAP maps IVF inverted lists, IO_FLAG_MMAP_IFC the
+        # codes of flat (SQ8) indexes
+        mmap_flag = faiss.IO_FLAG_MMAP if len(messages) >= IVF_MIN_VECTORS else faiss.IO_FLAG_MMAP_IFC
+        index = faiss.read_index(str(INDEX_PATH), mmap_flag | faiss.IO_FLAG_READ_ONLY)
+        expected_dim = get_model().get_sentence_embedding_dimension()
+        if index.d != expected_dim:
+            raise ValueError(
+                f"FAISS index has dimension {index.d} but {EMBEDDING_MODEL} produces {expected_dim}. "
+                "Rebuild it with build_index after changing EMBEDDING_MODEL or EMBEDDING_DIM."
+            )
+        if index.metric_type != faiss.METRIC_INNER_PRODUCT:
+            # e.g. an older L2 index, whose ascending distances would be served as
+            # "higher is closer" cosine scores
+            raise ValueError(
+                "FAISS index does not use inner-product (cosine) search. "
+                "Rebuild it with build_index."
+            )
+        self.index = _prepare_for_search(index)
+        self._set_metadata(messages)
+
+    def _set_metadata(self, messages):
+        """
+        Store message metadata as one column per result field (SoA) for index-based lookups.
+        """
+        self.columns = {}
+        for key, field in RESULT_FIELDS.items():
+            # 1-D object arrays so a batch of row indices is gathered with one take()
+            column = np.empty(len(messages), dtype=object)
+            column[:] = [m.get(field) for m in messages]
+            self.columns[key] = column
+        self.num_messages = len(messages)
 
     def search(self, query: str, top_k: int = 5):
         """
@@ -93,34 +363,52 @@ class SemanticSearchEngine:
             top_k (int): Number of top results to return.
 
         Returns:
-            list: List of dicts with message metadata and similarity score.
+            list: List of dicts with message metadata and cosine similarity score (higher is closer).
 
         Raises:
             RuntimeError: If the index is not loaded.
         """
-        if self.index is None or not self.metadata:
+        return self.search_batch([query], top_k)[0]
+
+    def search_batch(self, queries, top_k: int = 5):
+        """
+        Search for the top_k most similar messages for several queries at once.
+
+        Queries missing from the embedding cache are encoded in one batch, and all are
+        searched with a single FAISS call on the stacked (B, d) query matrix. FAISS
+        releases the GIL during the search, so concurrent calls from worker threads overlap.
+
+        Args:
+            queries (list): List of query strings.
+            top_k (int): Number of top results to return per query.
+
+        Returns:
+            list: One result list per query, in the same order as `queries`.
+
+        Raises:
+            RuntimeError: If the index is not loaded.
+        """
+        if self.index is None or not self.num_messages:
             raise RuntimeError("Index not loaded. Call load_index() at startup.")
 
-        # Encode the query string to embedding
-        q_vec = model.encode([query], convert_to_numpy=True)
-        # Perform similarity search in the FAISS index
-        distances, indices = self.index.search(q_vec, top_k)
-
-        results = []
-        for score, idx in zip(distances[0], indices[0]):
-            if idx == -1:
-                continue
-            msg = self.metadata[idx]
-            results.append({
-                "conversationId": msg.get("conversationId"),
-                "messageId": msg.get("id"),
-                "snippet": msg.get("text"),
-                "participant": msg.get("participant"),
-                "timestamp": msg.get("timestamp"),
-                "score": float(score)
-            })
-
-        return results
+        q_vecs = _encode_queries(queries)
+        # FAISS allocates (B, k) outputs, so never ask for more hits than there are messages
+        distances, indices = self.index.search(q_vecs, min(top_k, self.num_messages))
+
+        return [self._format_results(d, i) for d, i in zip(distances, indices)]
+
+    def _format_results(self, distances, indices):
+        """
+        Turn one row of FAISS output into result dicts, skipping empty (-1) slots.
+        """
+        valid = indices != -1
+        idx = indices[valid]
+        keys = list(self.columns)
+        # gather every column for the surviving hits at once, then zip into rows
+        values = [column.take(idx).tolist() for column in self.columns.values()]
+        scores = distances[valid].tolist()
+
+        return [dict(zip(keys, row), score=score) for *row, score in zip(*values, scores)]
 
 # Singleton engine instance for use throughout the app
 semantic_engine = SemanticSearchEngine()
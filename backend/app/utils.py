@@ -1,9 +1,44 @@
 # backend/app/utils.py
-import json
+import mmap
 import os
+import threading
+from pathlib import Path
+import orjson
 
-DATA_PATH = os.path.join(os.path.dirname(__file__), "../../shared/data/flattenedMessages.json")
+# Resolved once at import so opens and stats never re-walk the ".." segments
+DATA_PATH = (Path(__file__).parent / ".." / ".." / "shared" / "data" / "flattenedMessages.json").resolve()
+
+# Files above this size are parsed straight from a memory map instead of a bytes copy
+MMAP_THRESHOLD = 100 * 1024 * 1024
+
+# path -> ((st_mtime_ns, st_size), parsed messages); reloaded only when the file changes
+_CACHE = {}
+# serializes reloads so concurrent requests after a change parse the file once
+_CACHE_LOCK = threading.Lock()
 
 def load_flattened_messages():
-    with open(DATA_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
+    """
+    Return the parsed flattened messages, memoized until the data file changes.
+
+    The returned list is shared between callers and must not be mutated.
+    """
+    st = os.stat(DATA_PATH)
+    key = (st.st_mtime_ns, st.st_size)
+    hit = _CACHE.get(DATA_PATH)
+    if hit is not None and hit[0] == key:
+        return hit[1]
+    with _CACHE_LOCK:
+        # another thread may have reloaded while this one waited
+        hit = _CACHE.get(DATA_PATH)
+        if hit is not None and hit[0] == key:
+            return hit[1]
+        messages = _read_messages()
+        _CACHE[DATA_PATH] = (key, messages)
+        return messages
+
+def _read_messages():
+    with open(DATA_PATH, "rb") as f:
+        if os.fstat(f.fileno()).st_size > MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                return orjson.loads(view)
+        return orjson.loads(f.read())
@@ -1,31 +1,54 @@
 import json
-import os
+import sys
+from pathlib import Path
 
 # Set paths relative to script location
-base_dir = os.path.dirname(os.path.abspath(__file__))
-input_path = os.path.join(base_dir, "../data/mockMessages.json")
-output_path = os.path.join(base_dir, "../data/flattenedMessages.json")
-
-# Load mock messages
-with open(input_path, "r") as f:
-    data = json.load(f)
-
-flattened = []
-
-# Flatten the nested messages
-for group in data:
-    for conv in group["data"]:
-        for msg in conv["messages"]:
-            flattened.append({
-                "conversationId": conv["id"],
-                "subject": conv.get("subject", ""),
-                "sender": msg["sender"],
-                "text": msg["text"],
-                "timestamp": msg["timestamp"]
-            })
-
-# Save to output file
-with open(output_path, "w") as f:
-    json.dump(flattened, f, indent=2)
-
-print(f"✅ Flattened {len(flattened)} messages to {output_path}")
+base_dir = Path(__file__).resolve().parent
+input_path = (base_dir / ".." / "data" / "mockMessages.json").resolve()
+output_path = (base_dir / ".." / "data" / "flattenedMessages.json").resolve()
+
+
+def flatten(data):
+    """Flatten grouped mock messages (date groups -> conversations -> messages) into one list"""
+    # Flatten the nested messages in one comprehension; the one-element
+    # `for ... in [(...)]` binds the per-conversation fields once per conversation
+    return [
+        {
+            "conversationId": conversation_id,
+            "subject": subject,
+            "sender": msg["sender"],
+            "text": msg["text"],
+            "timestamp": msg["timestamp"]
+        }
+        for group in data
+        for conv in group["data"]
+        for conversation_id, subject in [(conv["id"], conv.get("subject", ""))]
+        for msg in conv["messages"]
+    ]
+
+
+def main(pretty=False):
+    """Flatten mockMessages.json into flattenedMessages.json (compact unless pretty)"""
+    # Load mock messages; json.loads takes the raw bytes, skipping the text-mode decoder
+    with open(input_path, "rb") as f:
+        flattened = flatten(json.loads(f.read()))
+
+    # Serialize up front so the file gets one write instead of json.dump's write per
+    # token; the backend is the only reader, so skip indentation by default
+    if pretty:
+        payload = json.dumps(flattened, indent=2)
+    else:
+        payload = json.dumps(flattened, separators=(",", ":"))
+
+    # Save to a temp file and rename it over the output so the running backend
+    # never reads a partially written file
+    tmp_path = output_path.with_name(output_path.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        f.write(payload)
+    tmp_path.replace(output_path)
+
+    print(f"✅ Flattened {len(flattened)} messages to {output_path}")
+
+
+if __name__ == "__main__":
+    main(pretty="--pretty" in sys.argv[1:])